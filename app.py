@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import os
+import uuid
 from components.dashboard import render_dashboard
 from components.summary import render_summary
 from components.model_ranking import render_model_ranking
@@ -19,31 +20,63 @@ from components.top_images import render_top_images
 from components.export_data import render_export_data
 from components.conclusion import render_conclusion
 from components.help_section import render_help_section
-from utils.utils import load_data, calculate_model_metrics
+from utils.utils import load_data, load_long_data, is_long_format, ALL_LABELS
+from utils.prefetch import FilterPrefetcher, compute_filter_state
+from utils.datasets import DatasetManager
+from utils.memory import MemoryBudget
+
+# Set CROPLENS_STORAGE=long to keep one row per evaluated (image, model) pair
+# instead of the outer-merged wide frame, for campaigns with partial coverage
+STORAGE_MODE = os.environ.get('CROPLENS_STORAGE', 'wide')
 
 # Set page configuration
 st.set_page_config(page_title="Croplens AI", layout="wide")
 
+@st.cache_resource
+def get_memory_budget():
+    # One limit for every dataset and prefetched state on this server
+    return MemoryBudget()
+
+@st.cache_resource
+def get_prefetcher():
+    # Shared by every session on this server
+    return FilterPrefetcher(get_memory_budget())
+
+@st.cache_resource
+def get_dataset_manager():
+    # Shared by every session; prefetched states are dropped with their dataset
+    manager = DatasetManager(load_long_data if STORAGE_MODE == 'long' else load_data, get_memory_budget())
+    manager.on_evict(get_prefetcher().invalidate)
+    return manager
+
 def main():
     st.title("Advanced Model Evaluation Report")
     st.markdown("Evaluate machine learning models for object detection in citrus groves. Use filters to explore performance metrics and visualizations.")
 
-    # Data folder path
-    data_folder = r"data"
-    if not os.path.exists(data_folder):
-        st.error(f"Data folder not found: {data_folder}")
+    # Campaigns under the data root
+    manager = get_dataset_manager()
+    if not os.path.exists(manager.root):
+        st.error(f"Data folder not found: {manager.root}")
         return
+    campaigns = manager.list_campaigns()
+    if not campaigns:
+        st.error(f"No CSV files found in {manager.root}")
+        return
+    selected_campaign = st.selectbox("Select Campaign", list(campaigns), key='campaign', help="Choose the evaluation campaign to explore.")
 
     # Load data
     with st.spinner("Loading data..."):
-        df, model_nums = load_data(data_folder)
+        df, model_nums, dataset_key = manager.get(selected_campaign, campaigns[selected_campaign])
     if df is None:
         return
 
     # Check for required columns
     required_cols = ['year', 'domaine', 'porte_greffe', 'parcelle', 'filename']
-    for mn in model_nums:
-        required_cols.extend([f'precision_{mn}', f'recall_{mn}', f'tp_{mn}', f'fp_{mn}', f'fn_{mn}'])
+    if is_long_format(df):
+        required_cols.extend(['model', 'precision', 'recall', 'tp', 'fp', 'fn'])
+    else:
+        for mn in model_nums:
+            required_cols.extend([f'precision_{mn}', f'recall_{mn}', f'tp_{mn}', f'fp_{mn}', f'fn_{mn}'])
     
     missing_cols = [col for col in required_cols if col not in df.columns]
     if missing_cols:
@@ -69,19 +102,20 @@ def main():
             parcelles = sorted(df['parcelle'].unique().astype(str))
             selected_parcelle = st.selectbox("Select Parcelle", ['All Parcelles'] + parcelles, key='parcelle', help="Filter by specific plot or parcel.")
 
-    # Filter data
-    filtered_df = df.copy()
-    if selected_year != 'All Years':
-        filtered_df = filtered_df[filtered_df['year'].astype(str) == selected_year]
-    if selected_domaine != 'All Domaines':
-        filtered_df = filtered_df[filtered_df['domaine'] == selected_domaine]
-    if selected_porte_greffe != 'All Porte Greffes':
-        filtered_df = filtered_df[filtered_df['porte_greffe'] == selected_porte_greffe]
-    if selected_parcelle != 'All Parcelles':
-        filtered_df = filtered_df[filtered_df['parcelle'].astype(str) == selected_parcelle]
-
-    # Calculate model metrics
-    model_metrics = calculate_model_metrics(filtered_df, model_nums)
+    # Filter data, reusing a prefetched state when the selection was anticipated
+    selection = (selected_year, selected_domaine, selected_porte_greffe, selected_parcelle)
+    prefetcher = get_prefetcher()
+    # Stop the previous selection's prefetching so it does not compete with this rerun
+    owner = st.session_state.setdefault('prefetch_owner', uuid.uuid4().hex)
+    prefetcher.cancel(owner)
+    cached = prefetcher.get((dataset_key, selection))
+    if cached is None:
+        filtered_df, model_metrics = compute_filter_state(df, model_nums, selection)
+        prefetcher.put((dataset_key, selection), (filtered_df, model_metrics))
+    else:
+        filtered_df, model_metrics = cached
+    # Components may mutate the frame, so never hand out the cached object
+    filtered_df = filtered_df.copy()
     metrics_df = pd.DataFrame(model_metrics)
 
     # Render components
@@ -104,5 +138,14 @@ def main():
     render_conclusion(metrics_df)
     render_help_section()
 
+    # Warm up neighbouring selections while the user is idle
+    options = (
+        [ALL_LABELS['year']] + years,
+        [ALL_LABELS['domaine']] + domaines,
+        [ALL_LABELS['porte_greffe']] + porte_greffes,
+        [ALL_LABELS['parcelle']] + parcelles
+    )
+    prefetcher.schedule(owner, dataset_key, df, model_nums, selection, options)
+
 if __name__ == "__main__":
     main()
@@ -1,6 +1,7 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from utils.utils import is_long_format, to_wide
 
 def render_correlation_heatmap(filtered_df, model_nums):
     with st.expander("Correlation Between Model Precisions", expanded=False):
@@ -15,7 +16,10 @@ def render_correlation_heatmap(filtered_df, model_nums):
             st.warning("At least two models are required to compute correlations.")
             return
 
-        # Prepare data
+        # Prepare data; correlations need images aligned across models, so the
+        # long format is pivoted here, for precision only
+        if is_long_format(filtered_df):
+            filtered_df = to_wide(filtered_df, model_nums, ['precision'])
         prec_df = filtered_df[[f'precision_{mn}' for mn in model_nums]]
         if prec_df.empty or prec_df.shape[1] < 2:
             st.warning("Insufficient data to compute correlations.")
@@ -1,15 +1,24 @@
 import streamlit as st
+from utils.utils import count_images
 
 def render_dashboard(metrics_df, model_nums, filtered_df):
     with st.expander("Dashboard Overview", expanded=True):
         winner = max(metrics_df.to_dict('records'), key=lambda x: x['f1'], default={'model': 'None', 'f1': 0})
+        total_images = count_images(filtered_df)
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             st.metric("Total Models", len(model_nums))
         with col2:
-            st.metric("Total Images", len(filtered_df))
+            st.metric("Total Images", total_images)
         with col3:
             st.metric("Winning Model", winner['model'])
         with col4:
             st.metric("Top F1 Score", f"{winner['f1']*100:.2f}%")
+        if not metrics_df.empty and (metrics_df['images_evaluated'] < total_images).any():
+            st.markdown("**Coverage**: not every model was evaluated on every image. Metrics of each model only use the images it was evaluated on.")
+            coverage_df = metrics_df[['model', 'images_evaluated']].copy()
+            coverage_df['coverage'] = (coverage_df['images_evaluated'] / total_images).map('{:.2%}'.format)
+            st.dataframe(coverage_df, use_container_width=True)
+        else:
+            st.markdown(f"**Coverage**: every model was evaluated on all {total_images} images.")
         st.markdown("**Quick Insights**: This dashboard summarizes key metrics across all models. Expand sections below for detailed analysis.")
\ No newline at end of file
@@ -1,15 +1,12 @@
 import streamlit as st
 import pandas as pd
+from utils.utils import image_metric_means
 
 def render_error_analysis(filtered_df, model_nums):
     with st.expander("Error Analysis", expanded=False):
         st.markdown("Identify images with high false positives or false negatives for further investigation.")
-        error_data = filtered_df[['filename', 'year', 'domaine', 'porte_greffe', 'parcelle']].copy()
-        for mn in model_nums:
-            error_data[f'fp_{mn}'] = filtered_df[f'fp_{mn}']
-            error_data[f'fn_{mn}'] = filtered_df[f'fn_{mn}']
-        error_data['avg_fp'] = error_data[[f'fp_{mn}' for mn in model_nums]].mean(axis=1)
-        error_data['avg_fn'] = error_data[[f'fn_{mn}' for mn in model_nums]].mean(axis=1)
+        error_data = image_metric_means(filtered_df, model_nums, 'fp').rename(columns={'fp': 'avg_fp'})
+        error_data['avg_fn'] = image_metric_means(filtered_df, model_nums, 'fn')['fn']
         high_errors = error_data[error_data[['avg_fp', 'avg_fn']].max(axis=1) > error_data[['avg_fp', 'avg_fn']].quantile(0.95).max()]
         st.dataframe(high_errors[['filename', 'year', 'domaine', 'porte_greffe', 'parcelle', 'avg_fp', 'avg_fn']].style.format({
             'avg_fp': '{:.1f}',
@@ -1,6 +1,7 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from utils.utils import context_means
 @st.cache_data
 def render_performance_by_year(filtered_df, model_nums):
     with st.expander("Performance by Year", expanded=False):
@@ -9,13 +10,10 @@ def render_performance_by_year(filtered_df, model_nums):
         # Debug: Show available years
 
         
-        year_data = filtered_df.groupby('year').agg({
-            f'precision_{i}': 'mean' for i in model_nums
+        year_data = pd.DataFrame({
+            'avg_precision': context_means(filtered_df, model_nums, 'year', 'precision'),
+            'avg_recall': context_means(filtered_df, model_nums, 'year', 'recall')
         }).reset_index()
-        year_data['avg_precision'] = year_data[[f'precision_{i}' for i in model_nums]].mean(axis=1)
-        year_data['avg_recall'] = filtered_df.groupby('year').agg({
-            f'recall_{i}': 'mean' for i in model_nums
-        }).reset_index()[[f'recall_{i}' for i in model_nums]].mean(axis=1)
         
         fig_scatter = px.scatter(
             year_data,
@@ -1,12 +1,11 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from utils.utils import melt_metric
 @st.cache_data
 def render_precision_distribution(filtered_df, model_nums):
     with st.expander("Precision Distribution Across Models", expanded=False):
-        precision_cols = [f'precision_{mn}' for mn in model_nums]
-        melt_df_precision = filtered_df.melt(id_vars=['filename'], value_vars=precision_cols, var_name='model', value_name='precision')
-        melt_df_precision['model'] = melt_df_precision['model'].str.replace('precision_', 'Model ')
+        melt_df_precision = melt_metric(filtered_df, model_nums, 'precision')
         fig_box_precision = px.box(
             melt_df_precision,
             x='model',
@@ -1,12 +1,13 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from utils.utils import model_frame
 
 def render_precision_trends(filtered_df, model_nums):
     with st.expander("Precision Trends Over Years", expanded=False):
         long_df = []
         for mn in model_nums:
-            temp_df = filtered_df[['year', f'precision_{mn}']].groupby('year')[f'precision_{mn}'].mean().reset_index()
+            temp_df = model_frame(filtered_df, mn, ['precision']).groupby('year')[f'precision_{mn}'].mean().reset_index()
             temp_df = temp_df.rename(columns={f'precision_{mn}': 'avg_precision'})
             temp_df['model'] = f'Model {mn}'
             long_df.append(temp_df)
@@ -1,12 +1,11 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from utils.utils import melt_metric
 
 def render_recall_distribution(filtered_df, model_nums):
     with st.expander("Recall Distribution Across Models", expanded=False):
-        recall_cols = [f'recall_{mn}' for mn in model_nums]
-        melt_df_recall = filtered_df.melt(id_vars=['filename'], value_vars=recall_cols, var_name='model', value_name='recall')
-        melt_df_recall['model'] = melt_df_recall['model'].str.replace('recall_', 'Model ')
+        melt_df_recall = melt_metric(filtered_df, model_nums, 'recall')
         fig_box_recall = px.box(
             melt_df_recall,
             x='model',
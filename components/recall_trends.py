@@ -1,6 +1,7 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from utils.utils import is_long_format, model_frame
 
 def render_recall_trends(filtered_df, model_nums):
     with st.expander("Recall Trends Over Years", expanded=False):
@@ -9,8 +10,9 @@ def render_recall_trends(filtered_df, model_nums):
             long_df_recall = []
             for mn in model_nums:
                 rec_col = f'recall_{mn}'
-                if rec_col in df.columns:
-                    temp_df = df[df[rec_col] > 0][['year', rec_col]].groupby('year')[rec_col].mean().reset_index()
+                if is_long_format(df) or rec_col in df.columns:
+                    temp_df = model_frame(df, mn, ['recall'])
+                    temp_df = temp_df[temp_df[rec_col] > 0][['year', rec_col]].groupby('year')[rec_col].mean().reset_index()
                     if not temp_df.empty:
                         temp_df = temp_df.rename(columns={rec_col: 'avg_recall'})
                         temp_df['model'] = f'Model {mn}'
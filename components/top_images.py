@@ -1,11 +1,11 @@
 import streamlit as st
 import pandas as pd
+from utils.utils import image_metric_means
 
 def render_top_images(filtered_df, model_nums):
     with st.expander("Top 5 Images by Average Precision", expanded=False):
-        image_metrics = filtered_df[['filename', 'year', 'domaine', 'porte_greffe', 'parcelle']].copy()
-        image_metrics['avg_precision'] = filtered_df[[f'precision_{i}' for i in model_nums]].mean(axis=1)
-        image_metrics['avg_recall'] = filtered_df[[f'recall_{i}' for i in model_nums]].mean(axis=1)
+        image_metrics = image_metric_means(filtered_df, model_nums, 'precision').rename(columns={'precision': 'avg_precision'})
+        image_metrics['avg_recall'] = image_metric_means(filtered_df, model_nums, 'recall')['recall']
         top_images = image_metrics.sort_values('avg_precision', ascending=False).head(5)
         st.dataframe(
             top_images.style.format({
@@ -1,16 +1,18 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from utils.utils import model_frame
 
 def render_tp_fp_fn(filtered_df, model_nums):
     with st.expander("True Positives, False Positives, and False Negatives", expanded=False):
         totals = []
         for mn in model_nums:
+            counts = model_frame(filtered_df, mn, ['tp', 'fp', 'fn'])
             totals.append({
                 'model': f'Model {mn}',
-                'True Positives': filtered_df[f'tp_{mn}'].sum(),
-                'False Positives': filtered_df[f'fp_{mn}'].sum(),
-                'False Negatives': filtered_df[f'fn_{mn}'].sum()
+                'True Positives': counts[f'tp_{mn}'].sum(),
+                'False Positives': counts[f'fp_{mn}'].sum(),
+                'False Negatives': counts[f'fn_{mn}'].sum()
             })
         totals_df = pd.DataFrame(totals)
         totals_melt = totals_df.melt(id_vars='model', var_name='Metric', value_name='Count')
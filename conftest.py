@@ -0,0 +1 @@
+# Lets pytest import the app's top-level packages (utils, components) from the repo root
@@ -0,0 +1,176 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from utils.compare import aggregate_pair, compare_datasets, load_pair_aggregates, benjamini_hochberg, DigestIndex, _finalize
+from utils.utils import calculate_model_metrics, load_data
+
+def make_rows(n, precision=0.9, recall=0.8):
+    return pd.DataFrame({
+        'compagnie': [2022 + i % 2 for i in range(n)],
+        'Domaine': ['SAOUDA' if i % 3 else 'ONAGRI' for i in range(n)],
+        'Porte-greffe': ['BIGARADIER'] * n,
+        'parcelle': [10010 + i % 4 for i in range(n)],
+        'Filename': [f'IMG-{i:05d}.jpg' for i in range(n)],
+        'True_count': [20] * n,
+        'detect_count': [18] * n,
+        'TP': [16 + i % 3 for i in range(n)],
+        'FP': [2] * n,
+        'FN': [4 - i % 3 for i in range(n)],
+        'Precision': [precision + 0.01 * (i % 5) for i in range(n)],
+        'Recall': [recall + 0.01 * (i % 7) for i in range(n)]
+    })
+
+def write_folder(folder, frames):
+    os.makedirs(folder, exist_ok=True)
+    for model_num, df in frames.items():
+        df.to_csv(os.path.join(folder, f'eval_model_{model_num}_Sheet1.csv'), index=False)
+    return str(folder)
+
+def overall(result, model_num):
+    return result[(result['model'] == model_num) & (result['context'] == 'all')].iloc[0]
+
+def test_finalize_paired_statistics():
+    # Two shared images with precision 0.8 -> 0.7 and 0.6 -> 0.4
+    aggregates = pd.DataFrame({
+        'n_shared': [2], 'n_added': [1], 'n_removed': [0],
+        'n_valid_old': [2], 'n_valid_new': [2], 'n_paired': [2],
+        'precision_old': [1.4], 'precision_new': [1.1], 'precision_diff': [-0.3], 'precision_diff_sq': [0.01 + 0.04],
+        'recall_old': [1.0], 'recall_new': [1.0], 'recall_diff': [0.0], 'recall_diff_sq': [0.0],
+        'tp_old': [10], 'tp_new': [8], 'fp_old': [2], 'fp_new': [3], 'fn_old': [1], 'fn_new': [3]
+    })
+    metrics = _finalize(aggregates).iloc[0]
+    assert metrics['precision_old'] == pytest.approx(0.7)
+    assert metrics['delta_precision'] == pytest.approx(-0.15)
+    # Differences -0.1 and -0.2: sd = 0.0707, t = -0.15 / (0.0707 / sqrt(2)) = -3
+    assert metrics['t_precision'] == pytest.approx(-3.0)
+    assert np.isnan(metrics['t_recall'])
+    assert metrics['f1_old'] == pytest.approx(2 * 0.7 * 0.5 / 1.2)
+    assert metrics['delta_tp'] == -2
+    assert metrics['n_added'] == 1
+
+def test_identical_versions_have_no_deltas(tmp_path):
+    old = write_folder(tmp_path / 'old', {1: make_rows(30), 2: make_rows(30, 0.7)})
+    new = write_folder(tmp_path / 'new', {1: make_rows(30), 2: make_rows(30, 0.7)})
+    result = compare_datasets(old, new, cache_dir=str(tmp_path / 'cache'))
+    assert not result['regression'].any()
+    assert (result['delta_precision'].abs() < 1e-12).all()
+    assert (result['delta_tp'] == 0).all()
+    assert overall(result, 1)['n_shared'] == 30
+
+def test_coverage_change_is_not_a_regression(tmp_path):
+    old = write_folder(tmp_path / 'old', {1: make_rows(30)})
+    new = write_folder(tmp_path / 'new', {1: make_rows(30).head(10)})
+    result = compare_datasets(old, new, cache_dir=str(tmp_path / 'cache'))
+    row = overall(result, 1)
+    assert not result['regression'].any()
+    assert (row['n_shared'], row['n_added'], row['n_removed']) == (10, 0, 20)
+    assert row['delta_tp'] == 0
+
+def test_precision_drop_is_flagged(tmp_path):
+    worse = make_rows(30)
+    worse['Precision'] = worse['Precision'] - 0.05 - 0.01 * (worse.index % 2)
+    old = write_folder(tmp_path / 'old', {1: make_rows(30), 2: make_rows(30)})
+    new = write_folder(tmp_path / 'new', {1: worse, 2: make_rows(30)})
+    result = compare_datasets(old, new, cache_dir=str(tmp_path / 'cache'))
+    assert overall(result, 1)['regression']
+    assert overall(result, 1)['delta_precision'] == pytest.approx(-0.055)
+    assert not result.loc[result['model'] == 2, 'regression'].any()
+
+def test_unchanged_files_reuse_cached_aggregates(tmp_path, monkeypatch):
+    old = write_folder(tmp_path / 'old', {1: make_rows(10)})
+    new = write_folder(tmp_path / 'new', {1: make_rows(10)})
+    cache_dir = str(tmp_path / 'cache')
+    compare_datasets(old, new, cache_dir=cache_dir)
+
+    def fail(*args):
+        raise AssertionError("unchanged file was re-aggregated")
+    monkeypatch.setattr('utils.compare.aggregate_pair', fail)
+    monkeypatch.setattr('utils.compare.read_model_file', fail)
+    digests = DigestIndex(cache_dir)
+    load_pair_aggregates(os.path.join(old, 'eval_model_1_Sheet1.csv'), os.path.join(new, 'eval_model_1_Sheet1.csv'), digests, cache_dir)
+    assert not digests._dirty
+
+def test_aggregate_pair_counts_removed_model():
+    rows = pd.DataFrame({
+        'filename': ['a.jpg', 'b.jpg'], 'year': [2022, 2022], 'domaine': ['X', 'X'],
+        'porte_greffe': ['P', 'P'], 'parcelle': [1, 2],
+        'precision': [0.9, 0.8], 'recall': [0.7, 0.6], 'tp': [9, 8], 'fp': [1, 2], 'fn': [3, 4]
+    })
+    aggregates = aggregate_pair(rows, None)
+    row = aggregates[aggregates['context'] == 'all'].iloc[0]
+    assert (row['n_shared'], row['n_removed']) == (0, 2)
+    assert row['tp_old'] == 0
+
+def test_pure_noise_is_not_flagged(tmp_path):
+    # Same images re-evaluated with measurement noise only: no context should
+    # be reported, however many (model, context) rows are tested
+    rng = np.random.default_rng(0)
+    old_frames, new_frames = {}, {}
+    for model_num in range(1, 9):
+        base = make_rows(200, 0.7, 0.6)
+        old_frames[model_num] = base
+        noisy = base.copy()
+        for col in ['Precision', 'Recall']:
+            noisy[col] = (base[col] + rng.normal(0, 0.05, len(base))).clip(0.01, 1)
+        new_frames[model_num] = noisy
+    old = write_folder(tmp_path / 'old', old_frames)
+    new = write_folder(tmp_path / 'new', new_frames)
+    result = compare_datasets(old, new, cache_dir=str(tmp_path / 'cache'))
+    assert not result['regression'].any()
+
+def test_small_contexts_are_not_tested(tmp_path):
+    worse = make_rows(40)
+    worse.loc[:9, 'Precision'] = worse.loc[:9, 'Precision'] - 0.3
+    worse['parcelle'] = [1] * 10 + [2] * 30
+    base = make_rows(40)
+    base['parcelle'] = worse['parcelle']
+    old = write_folder(tmp_path / 'old', {1: base})
+    new = write_folder(tmp_path / 'new', {1: worse})
+    result = compare_datasets(old, new, cache_dir=str(tmp_path / 'cache'))
+    row = result[(result['context'] == 'parcelle') & (result['value'] == '1')].iloc[0]
+    assert row['delta_precision'] == pytest.approx(-0.3)
+    assert not row['regression'] and np.isnan(row['q_precision'])
+
+def test_means_match_dashboard(tmp_path):
+    # Rows with precision 0 are left out of the means, as on the dashboard
+    old_rows = make_rows(30)
+    old_rows.loc[:4, 'Precision'] = 0
+    new_rows = make_rows(30, 0.85)
+    new_rows.loc[3:7, 'Precision'] = 0
+    old = write_folder(tmp_path / 'old', {1: old_rows})
+    new = write_folder(tmp_path / 'new', {1: new_rows})
+    row = overall(compare_datasets(old, new, cache_dir=str(tmp_path / 'cache')), 1)
+    for folder, side in [(old, 'old'), (new, 'new')]:
+        df, model_nums = load_data(folder)
+        metrics = calculate_model_metrics(df, model_nums)[0]
+        assert row[f'precision_{side}'] == pytest.approx(metrics['avg_precision'])
+        assert row[f'recall_{side}'] == pytest.approx(metrics['avg_recall'])
+        assert row[f'f1_{side}'] == pytest.approx(metrics['f1'])
+    assert (row['n_valid_old'], row['n_valid_new'], row['n_paired']) == (25, 25, 22)
+
+def test_benjamini_hochberg():
+    q = benjamini_hochberg([0.01, np.nan, 0.04, 0.03])
+    assert q[0] == pytest.approx(0.03)
+    assert np.isnan(q[1])
+    assert q[2] == pytest.approx(0.04)
+    assert q[3] == pytest.approx(0.04)
+
+def test_stale_pickles_are_pruned(tmp_path):
+    old = write_folder(tmp_path / 'old', {1: make_rows(10)})
+    new = write_folder(tmp_path / 'new', {1: make_rows(10)})
+    cache_dir = str(tmp_path / 'cache')
+    compare_datasets(old, new, cache_dir=cache_dir)
+    stale_version = os.path.join(cache_dir, 'images', 'v1')
+    os.makedirs(stale_version)
+
+    write_folder(tmp_path / 'old', {1: make_rows(10, 0.6)})
+    write_folder(tmp_path / 'new', {1: make_rows(10, 0.5)})
+    compare_datasets(old, new, cache_dir=cache_dir)
+    digests = DigestIndex(cache_dir)
+    live = {digests.digest(os.path.join(folder, 'eval_model_1_Sheet1.csv')) for folder in [old, new]}
+    images = os.listdir(os.path.join(cache_dir, 'images', 'v3'))
+    pairs = os.listdir(os.path.join(cache_dir, 'pairs', 'v3'))
+    assert {name[:-4] for name in images} == live
+    assert len(pairs) == 1 and set(pairs[0][:-4].split('-')) == live
+    assert not os.path.exists(stale_version)
@@ -0,0 +1,64 @@
+from utils.memory import MemoryBudget
+
+def test_least_recently_used_entry_is_evicted():
+    evicted = []
+    budget = MemoryBudget(max_bytes=100)
+    budget.charge('a', 40, evicted.append)
+    budget.charge('b', 40, evicted.append)
+    budget.touch('a')
+    budget.charge('c', 40, evicted.append)
+    assert evicted == ['b']
+    assert budget.total_bytes == 80
+
+def test_new_entry_without_parent_is_kept_even_if_too_large():
+    evicted = []
+    budget = MemoryBudget(max_bytes=100)
+    budget.charge('a', 40, evicted.append)
+    budget.charge('b', 150, evicted.append)
+    assert evicted == ['a']
+    assert budget.total_bytes == 150
+
+def test_child_is_dropped_before_its_parent():
+    evicted = []
+    budget = MemoryBudget(max_bytes=100)
+    budget.charge('dataset', 60, evicted.append)
+    budget.charge('state_1', 30, evicted.append, parent='dataset')
+    budget.charge('state_2', 30, evicted.append, parent='dataset')
+    assert evicted == ['state_1']
+    # Only the parent and the new child remain over the limit: the child goes
+    budget.charge('state_3', 50, evicted.append, parent='dataset')
+    assert evicted == ['state_1', 'state_2', 'state_3']
+    assert budget.total_bytes == 60
+
+def test_release_does_not_call_back():
+    evicted = []
+    budget = MemoryBudget(max_bytes=100)
+    budget.charge('a', 40, evicted.append)
+    budget.release('a')
+    budget.release('a')
+    assert evicted == []
+    assert budget.total_bytes == 0
+
+def test_states_never_evict_another_dataset():
+    evicted = []
+    budget = MemoryBudget(max_bytes=100)
+    budget.charge(('dataset', 'A'), 40, evicted.append)
+    budget.charge(('dataset', 'B'), 40, evicted.append)
+    budget.charge(('state', 'B1'), 15, evicted.append, parent=('dataset', 'B'))
+    budget.charge(('state', 'B2'), 15, evicted.append, parent=('dataset', 'B'))
+    # A is the least recently used entry, but B's states go first, then the new one
+    assert evicted == [('state', 'B1')]
+    budget.charge(('state', 'B3'), 25, evicted.append, parent=('dataset', 'B'))
+    assert evicted == [('state', 'B1'), ('state', 'B2'), ('state', 'B3')]
+    assert budget.total_bytes == 80
+
+def test_new_dataset_evicts_states_before_datasets():
+    evicted = []
+    budget = MemoryBudget(max_bytes=100)
+    budget.charge(('dataset', 'A'), 40, evicted.append)
+    budget.charge(('state', 'A1'), 20, evicted.append, parent=('dataset', 'A'))
+    budget.charge(('dataset', 'B'), 40, evicted.append)
+    budget.charge(('dataset', 'C'), 20, evicted.append)
+    assert evicted == [('state', 'A1')]
+    budget.charge(('dataset', 'D'), 20, evicted.append)
+    assert evicted == [('state', 'A1'), ('dataset', 'A')]
@@ -0,0 +1,87 @@
+import threading
+import pandas as pd
+from utils.memory import MemoryBudget
+from utils.prefetch import FilterPrefetcher, neighbor_selections
+
+SELECTION = ('All Years', 'All Domaines', 'All Porte Greffes', 'All Parcelles')
+OPTIONS = (
+    ['All Years', '2022', '2023'],
+    ['All Domaines', 'SAOUDA'],
+    ['All Porte Greffes'],
+    ['All Parcelles', '10010', '10030']
+)
+
+def small_state():
+    frame = pd.DataFrame({'filename': ['a.jpg'], 'precision_1': [0.9]})
+    return frame, [{'model': 'Model 1', 'data': frame}]
+
+def blocking_compute(monkeypatch, release):
+    started = threading.Event()
+    def compute(df, model_nums, selection):
+        started.set()
+        release.wait(5)
+        return small_state()
+    monkeypatch.setattr('utils.prefetch.compute_filter_state', compute)
+    return started
+
+def wait_idle(prefetcher):
+    prefetcher._executor.shutdown(wait=True)
+
+def test_neighbors_differ_by_exactly_one_field():
+    neighbors = neighbor_selections(SELECTION, OPTIONS)
+    assert len(neighbors) == 2 + 1 + 0 + 2
+    for neighbor in neighbors:
+        assert sum(a != b for a, b in zip(neighbor, SELECTION)) == 1
+    assert len(set(neighbors)) == len(neighbors)
+
+def test_schedule_does_nothing_when_disabled():
+    prefetcher = FilterPrefetcher(MemoryBudget(), enabled=False)
+    prefetcher.schedule('owner', 'dataset', None, [1], SELECTION, OPTIONS)
+    assert prefetcher._cache == {}
+    assert prefetcher._futures == {}
+    assert prefetcher._generations == {}
+    assert prefetcher._tokens == {}
+
+def test_bookkeeping_is_empty_once_jobs_finish(monkeypatch):
+    monkeypatch.setattr('utils.prefetch.compute_filter_state', lambda df, model_nums, selection: small_state())
+    prefetcher = FilterPrefetcher(MemoryBudget(), max_workers=2, enabled=True)
+    prefetcher.schedule('owner', 'dataset', None, [1], SELECTION, OPTIONS)
+    wait_idle(prefetcher)
+    assert len(prefetcher._cache) == 5
+    assert prefetcher._futures == {}
+    assert prefetcher._generations == {}
+
+def test_cancel_drops_queued_jobs(monkeypatch):
+    release = threading.Event()
+    started = blocking_compute(monkeypatch, release)
+    prefetcher = FilterPrefetcher(MemoryBudget(), max_workers=1, enabled=True)
+    prefetcher.schedule('owner', 'dataset', None, [1], SELECTION, OPTIONS)
+    started.wait(5)
+    prefetcher.cancel('owner')
+    release.set()
+    wait_idle(prefetcher)
+    # Only the job that was already running may have stored its state
+    assert len(prefetcher._cache) <= 1
+    assert prefetcher._futures == {}
+    assert prefetcher._generations == {}
+
+def test_invalidate_during_job_leaves_nothing_cached(monkeypatch):
+    release = threading.Event()
+    started = blocking_compute(monkeypatch, release)
+    budget = MemoryBudget()
+    prefetcher = FilterPrefetcher(budget, max_workers=1, enabled=True)
+    prefetcher.schedule('owner', 'dataset', None, [1], SELECTION, OPTIONS)
+    started.wait(5)
+    prefetcher.invalidate('dataset')
+    release.set()
+    wait_idle(prefetcher)
+    assert prefetcher._cache == {}
+    assert prefetcher._tokens == {}
+    assert budget.total_bytes == 0
+
+def test_put_with_stale_token_is_ignored():
+    prefetcher = FilterPrefetcher(MemoryBudget(), enabled=False)
+    prefetcher.put(('dataset', SELECTION), small_state(), token=object())
+    assert prefetcher.get(('dataset', SELECTION)) is None
+    prefetcher.put(('dataset', SELECTION), small_state())
+    assert prefetcher.get(('dataset', SELECTION)) is not None
@@ -0,0 +1,103 @@
+import os
+import pandas as pd
+import pytest
+from utils.utils import (
+    load_data, load_long_data, calculate_model_metrics, calculate_model_metrics_long,
+    context_means, image_metric_means, melt_metric, model_frame, count_images, to_wide, KEY_COLUMNS
+)
+
+def make_rows(n, offset=0.0):
+    return pd.DataFrame({
+        'compagnie': [2022 + i % 2 for i in range(n)],
+        'Domaine': ['SAOUDA' if i % 3 else 'ONAGRI' for i in range(n)],
+        'Porte-greffe': ['BIGARADIER' if i % 2 else 'VOLKA' for i in range(n)],
+        'parcelle': [10010 + i % 4 for i in range(n)],
+        'Filename': [f'IMG-{i:05d}.jpg' for i in range(n)],
+        'True_count': [20] * n,
+        'detect_count': [18] * n,
+        'TP': [16 + i % 3 for i in range(n)],
+        'FP': [2 + i % 2 for i in range(n)],
+        'FN': [4 - i % 3 for i in range(n)],
+        # Every seventh image has no detection, and is left out of the means
+        'Precision': [0 if i % 7 == 0 else 0.6 + offset + 0.03 * (i % 5) for i in range(n)],
+        'Recall': [0.5 + offset + 0.02 * (i % 6) for i in range(n)]
+    })
+
+def write_folder(folder, frames):
+    os.makedirs(folder, exist_ok=True)
+    for model_num, df in frames.items():
+        df.to_csv(os.path.join(folder, f'eval_model_{model_num}_Sheet1.csv'), index=False)
+    return str(folder)
+
+@pytest.fixture
+def full(tmp_path):
+    folder = write_folder(tmp_path / 'full', {1: make_rows(24), 2: make_rows(24, 0.1), 3: make_rows(24, -0.1)})
+    wide, model_nums = load_data(folder)
+    long, long_model_nums = load_long_data(folder)
+    assert model_nums == long_model_nums == [1, 2, 3]
+    return wide, long, model_nums
+
+@pytest.fixture
+def partial(tmp_path):
+    # Model 2 was only evaluated on the first 10 images
+    folder = write_folder(tmp_path / 'partial', {1: make_rows(24), 2: make_rows(24, 0.1).head(10)})
+    wide, model_nums = load_data(folder)
+    long, _ = load_long_data(folder)
+    return wide, long, model_nums
+
+def sort_keys(df):
+    return df.sort_values(KEY_COLUMNS, ignore_index=True)
+
+def test_model_metrics_match_on_full_coverage(full):
+    wide, long, model_nums = full
+    for wide_metrics, long_metrics in zip(calculate_model_metrics(wide, model_nums), calculate_model_metrics_long(long, model_nums)):
+        assert wide_metrics['model'] == long_metrics['model']
+        for key in ['avg_precision', 'avg_recall', 'f1']:
+            assert long_metrics[key] == pytest.approx(wide_metrics[key])
+        for key in ['total_tp', 'total_fp', 'total_fn', 'images_evaluated']:
+            assert long_metrics[key] == wide_metrics[key]
+        assert wide_metrics['images_evaluated'] == 24
+
+def test_helpers_match_on_full_coverage(full):
+    wide, long, model_nums = full
+    assert count_images(wide) == count_images(long) == 24
+    for context in ['year', 'domaine', 'porte_greffe', 'parcelle']:
+        pd.testing.assert_series_equal(
+            context_means(long, model_nums, context, 'precision'),
+            context_means(wide, model_nums, context, 'precision'),
+            check_names=False, check_index_type=False, check_categorical=False
+        )
+    wide_means = sort_keys(image_metric_means(wide, model_nums, 'recall'))
+    long_means = sort_keys(image_metric_means(long, model_nums, 'recall'))
+    pd.testing.assert_frame_equal(long_means, wide_means, check_dtype=False)
+    wide_melted = melt_metric(wide, model_nums, 'precision').sort_values(['filename', 'model'], ignore_index=True)
+    long_melted = melt_metric(long, model_nums, 'precision').sort_values(['filename', 'model'], ignore_index=True)
+    pd.testing.assert_frame_equal(long_melted, wide_melted, check_dtype=False)
+    wide_frame = sort_keys(model_frame(wide, 2, ['tp', 'fp']))
+    long_frame = sort_keys(model_frame(long, 2, ['tp', 'fp']).astype({'filename': object, 'domaine': object, 'porte_greffe': object}))
+    pd.testing.assert_frame_equal(long_frame, wide_frame, check_dtype=False)
+    columns = KEY_COLUMNS + [f'precision_{mn}' for mn in model_nums]
+    pd.testing.assert_frame_equal(sort_keys(to_wide(long, model_nums, ['precision'])), sort_keys(wide[columns]), check_dtype=False)
+
+def test_partial_coverage_only_counts_evaluated_pairs(partial):
+    wide, long, model_nums = partial
+    evaluated = make_rows(24, 0.1).head(10)
+    for metrics in [calculate_model_metrics(wide, model_nums), calculate_model_metrics_long(long, model_nums)]:
+        model_2 = metrics[1]
+        assert model_2['images_evaluated'] == 10
+        assert metrics[0]['images_evaluated'] == 24
+        assert model_2['total_tp'] == evaluated['TP'].sum()
+        assert model_2['total_fn'] == evaluated['FN'].sum()
+        valid = evaluated[evaluated['Precision'] > 0]
+        assert model_2['avg_precision'] == pytest.approx(valid['Precision'].mean())
+        assert model_2['avg_recall'] == pytest.approx(valid['Recall'].mean())
+    assert len(long) == 34
+    # Images without model 2 are averaged over model 1 alone
+    means = image_metric_means(long, model_nums, 'recall').set_index('filename')['recall']
+    assert means['IMG-00020.jpg'] == pytest.approx(make_rows(24).loc[20, 'Recall'])
+    assert means['IMG-00003.jpg'] == pytest.approx((make_rows(24).loc[3, 'Recall'] + evaluated.loc[3, 'Recall']) / 2)
+
+def test_count_images_counts_unique_keys(partial):
+    wide, long, model_nums = partial
+    assert count_images(long) == count_images(wide) == 24
+    assert count_images(long[long['model'] == 2]) == 10
@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import math
+import shutil
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from utils.utils import list_model_files, read_model_file, FILTER_COLUMNS, KEY_COLUMNS, CACHE_DIR
+
+# Bump whenever the cached frames or aggregate columns change, so stale pickles are ignored
+CACHE_VERSION = 3
+CONTEXT_COLUMNS = ['all'] + FILTER_COLUMNS
+PAIR_METRICS = ['precision', 'recall']
+COUNT_METRICS = ['tp', 'fp', 'fn']
+SUM_COLUMNS = (
+    ['n_shared', 'n_added', 'n_removed', 'n_valid_old', 'n_valid_new', 'n_paired']
+    + [f'{metric}_{side}' for metric in PAIR_METRICS + COUNT_METRICS for side in ['old', 'new']]
+    + [f'{metric}_{suffix}' for metric in PAIR_METRICS for suffix in ['diff', 'diff_sq']]
+)
+
+def _version_dir(cache_dir, kind):
+    return os.path.join(cache_dir, kind, f'v{CACHE_VERSION}')
+
+def _write_pickle(obj, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    pd.to_pickle(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+class DigestIndex:
+    # Content hashes looked up by (path, size, mtime_ns), so a file is only
+    # hashed the first time it is seen or after it changes
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.path = os.path.join(cache_dir, 'digests.json')
+        self._entries = {}
+        self._dirty = False
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self._entries = json.load(f)
+
+    def digest(self, file):
+        stat = os.stat(file)
+        key = f'{os.path.abspath(file)}:{stat.st_size}:{stat.st_mtime_ns}'
+        if key not in self._entries:
+            with open(file, 'rb') as f:
+                self._entries[key] = hashlib.sha1(f.read()).hexdigest()
+            self._dirty = True
+        return self._entries[key]
+
+    def save(self):
+        # Forget entries for files that no longer exist or have been rewritten,
+        # and return the digests still in use
+        live = {}
+        for key, digest in self._entries.items():
+            path, size, mtime_ns = key.rsplit(':', 2)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if f'{stat.st_size}:{stat.st_mtime_ns}' == f'{size}:{mtime_ns}':
+                live[key] = digest
+        if self._dirty or len(live) != len(self._entries):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f'{self.path}.{os.getpid()}-{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(live, f)
+            os.replace(tmp_path, self.path)
+        self._entries = live
+        self._dirty = False
+        return set(live.values())
+
+def prune_cache(live_digests, cache_dir=CACHE_DIR):
+    # Remove cached frames and pair aggregates for contents no longer on disk,
+    # and everything written under an older CACHE_VERSION
+    live_digests = set(live_digests) | {'none'}
+    for kind in ['images', 'pairs']:
+        kind_dir = os.path.join(cache_dir, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        current = _version_dir(cache_dir, kind)
+        for entry in os.scandir(kind_dir):
+            if entry.path != current:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        for name in os.listdir(current) if os.path.isdir(current) else []:
+            if not name.endswith('.pkl') or set(name[:-4].split('-')) <= live_digests:
+                continue
+            try:
+                os.remove(os.path.join(current, name))
+            except FileNotFoundError:
+                pass
+
+def load_image_frame(file, digest, cache_dir=CACHE_DIR):
+    # Parsed per-image rows of one model file, keyed by content
+    cache_path = os.path.join(_version_dir(cache_dir, 'images'), f'{digest}.pkl')
+    if os.path.exists(cache_path):
+        return pd.read_pickle(cache_path)
+    df = read_model_file(file)
+    df = df[KEY_COLUMNS + PAIR_METRICS + COUNT_METRICS].drop_duplicates(KEY_COLUMNS)
+    _write_pickle(df, cache_path)
+    return df
+
+def aggregate_pair(old_df, new_df):
+    # Join one model's old and new rows on the image keys and reduce them to
+    # per-context sums; deltas only use images present in both versions
+    empty = pd.DataFrame(columns=KEY_COLUMNS + PAIR_METRICS + COUNT_METRICS)
+    old_df = empty if old_df is None else old_df
+    new_df = empty if new_df is None else new_df
+    merged = old_df.merge(new_df, on=KEY_COLUMNS, how='outer', suffixes=('_old', '_new'), indicator=True)
+    shared = merged['_merge'] == 'both'
+    stats = pd.DataFrame({
+        'n_shared': shared.astype(int),
+        'n_added': (merged['_merge'] == 'right_only').astype(int),
+        'n_removed': (merged['_merge'] == 'left_only').astype(int)
+    })
+    # Like calculate_model_metrics, precision and recall means only use rows
+    # with precision > 0; paired differences need a valid row on both sides
+    valid = {}
+    for side in ['old', 'new']:
+        valid[side] = shared & (pd.to_numeric(merged[f'precision_{side}']) > 0)
+        stats[f'n_valid_{side}'] = valid[side].astype(int)
+    paired = valid['old'] & valid['new']
+    stats['n_paired'] = paired.astype(int)
+    for metric in PAIR_METRICS:
+        values = {side: pd.to_numeric(merged[f'{metric}_{side}']).astype(float) for side in ['old', 'new']}
+        for side in ['old', 'new']:
+            stats[f'{metric}_{side}'] = values[side].where(valid[side], 0)
+        diff = (values['new'] - values['old']).where(paired, 0)
+        stats[f'{metric}_diff'] = diff
+        stats[f'{metric}_diff_sq'] = diff ** 2
+    for metric in COUNT_METRICS:
+        for side in ['old', 'new']:
+            stats[f'{metric}_{side}'] = pd.to_numeric(merged[f'{metric}_{side}']).where(shared, 0).astype(float)
+    stats = stats[SUM_COLUMNS]
+
+    merged = merged.assign(all='all')
+    aggregates = []
+    for context in CONTEXT_COLUMNS:
+        grouped = stats.groupby(merged[context].astype(str)).sum()
+        grouped.index.name = 'value'
+        grouped = grouped.reset_index()
+        grouped.insert(0, 'context', context)
+        aggregates.append(grouped)
+    return pd.concat(aggregates, ignore_index=True)
+
+def load_pair_aggregates(old_file, new_file, digests, cache_dir=CACHE_DIR):
+    # Cached per (old content, new content) pair: a model whose file did not
+    # change since the last run costs one stat call and one pickle read
+    old_digest = digests.digest(old_file) if old_file else 'none'
+    new_digest = digests.digest(new_file) if new_file else 'none'
+    cache_path = os.path.join(_version_dir(cache_dir, 'pairs'), f'{old_digest}-{new_digest}.pkl')
+    if os.path.exists(cache_path):
+        return pd.read_pickle(cache_path)
+    old_df = load_image_frame(old_file, old_digest, cache_dir) if old_file else None
+    new_df = load_image_frame(new_file, new_digest, cache_dir) if new_file else None
+    aggregates = aggregate_pair(old_df, new_df)
+    _write_pickle(aggregates, cache_path)
+    return aggregates
+
+def _lower_tail(t):
+    # One-sided p-value of a drop, using the normal approximation of the t
+    # distribution (only applied to rows with at least min_shared pairs)
+    return t.map(lambda value: 0.5 * math.erfc(-value / math.sqrt(2)), na_action='ignore')
+
+def benjamini_hochberg(p_values):
+    # Benjamini-Hochberg adjusted p-values (q-values); NaN entries are not tested
+    p_values = np.asarray(p_values, dtype=float)
+    q_values = np.full(p_values.shape, np.nan)
+    tested = ~np.isnan(p_values)
+    m = tested.sum()
+    if m == 0:
+        return q_values
+    p = p_values[tested]
+    order = np.argsort(p)
+    ranked = p[order] * m / np.arange(1, m + 1)
+    q_sorted = np.minimum.accumulate(ranked[::-1])[::-1].clip(max=1)
+    q = np.empty(m)
+    q[order] = q_sorted
+    q_values[tested] = q
+    return q_values
+
+def _finalize(aggregates):
+    # Means on the valid rows of each version, paired t statistics on the
+    # images valid in both, from the per-context sums
+    metrics = pd.DataFrame(index=aggregates.index)
+    for col in ['n_shared', 'n_added', 'n_removed', 'n_valid_old', 'n_valid_new', 'n_paired']:
+        metrics[col] = aggregates[col].astype(int)
+    n = aggregates['n_paired'].astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for metric in PAIR_METRICS:
+            for side in ['old', 'new']:
+                count = aggregates[f'n_valid_{side}'].astype(float)
+                metrics[f'{metric}_{side}'] = (aggregates[f'{metric}_{side}'] / count).where(count > 0, np.nan)
+            metrics[f'delta_{metric}'] = metrics[f'{metric}_new'] - metrics[f'{metric}_old']
+            mean_diff = aggregates[f'{metric}_diff'] / n
+            var = ((aggregates[f'{metric}_diff_sq'] - n * mean_diff ** 2) / (n - 1)).clip(lower=0)
+            t = mean_diff / np.sqrt(var / n)
+            # 0/0 when every image is unchanged; a constant shift gives +/-inf
+            metrics[f't_{metric}'] = t.where((n > 1) & (mean_diff != 0), np.nan)
+        for side in ['old', 'new']:
+            total = metrics[f'precision_{side}'] + metrics[f'recall_{side}']
+            metrics[f'f1_{side}'] = (2 * metrics[f'precision_{side}'] * metrics[f'recall_{side}'] / total).where(total > 0, 0)
+    metrics['delta_f1'] = metrics['f1_new'] - metrics['f1_old']
+    for metric in COUNT_METRICS:
+        metrics[f'{metric}_old'] = aggregates[f'{metric}_old'].astype(int)
+        metrics[f'{metric}_new'] = aggregates[f'{metric}_new'].astype(int)
+        metrics[f'delta_{metric}'] = metrics[f'{metric}_new'] - metrics[f'{metric}_old']
+    return metrics
+
+def compare_datasets(old_folder, new_folder, min_delta=0.01, alpha=0.05, min_shared=30, cache_dir=CACHE_DIR):
+    old_files = dict(list_model_files(old_folder))
+    new_files = dict(list_model_files(new_folder))
+    digests = DigestIndex(cache_dir)
+    frames = []
+    for model_num in sorted(set(old_files) | set(new_files)):
+        aggregates = load_pair_aggregates(old_files.get(model_num), new_files.get(model_num), digests, cache_dir)
+        frames.append(aggregates.assign(model=model_num))
+    prune_cache(digests.save(), cache_dir)
+    keys = ['model', 'context', 'value']
+    if not frames:
+        return pd.DataFrame(columns=keys + ['regression'])
+
+    # One vectorized pass over every (model, context, value) row
+    aggregates = pd.concat(frames, ignore_index=True)
+    comparison = pd.concat([aggregates[keys], _finalize(aggregates)], axis=1)
+
+    # Rows with fewer than min_shared paired images are reported but never tested.
+    # The p-values of all tested rows and metrics form one family, adjusted with
+    # Benjamini-Hochberg so the false discovery rate stays at alpha.
+    tested = comparison['n_paired'] >= min_shared
+    p_values = pd.concat([
+        _lower_tail(comparison[f't_{metric}'].where(tested)) for metric in PAIR_METRICS
+    ], ignore_index=True)
+    q_values = benjamini_hochberg(p_values)
+    comparison['regression'] = False
+    for i, metric in enumerate(PAIR_METRICS):
+        q = q_values[i * len(comparison):(i + 1) * len(comparison)]
+        comparison[f'q_{metric}'] = q
+        comparison['regression'] |= (comparison[f'delta_{metric}'] <= -min_delta) & (comparison[f'q_{metric}'] <= alpha)
+    return comparison.sort_values(keys, ignore_index=True)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m utils.compare <old_data_folder> <new_data_folder>")
+        sys.exit(2)
+    result = compare_datasets(sys.argv[1], sys.argv[2])
+    regressions = result[result['regression']]
+    columns = ['model', 'context', 'value', 'n_paired', 'delta_precision', 'delta_recall', 'delta_f1', 'delta_tp', 'delta_fp', 'delta_fn']
+    coverage = result[(result['context'] == 'all') & ((result['n_added'] > 0) | (result['n_removed'] > 0))]
+    if not coverage.empty:
+        print("Coverage changes:")
+        print(coverage[['model', 'n_shared', 'n_added', 'n_removed']].to_string(index=False))
+    if regressions.empty:
+        print("No significant regressions found.")
+    else:
+        print(regressions[columns].to_string(index=False))
+    sys.exit(1 if not regressions.empty else 0)
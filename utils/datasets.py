@@ -0,0 +1,113 @@
+import os
+import glob
+import hashlib
+import threading
+import pandas as pd
+from utils.utils import list_model_files, CACHE_DIR
+from utils.memory import MemoryBudget
+
+DATA_ROOT = os.environ.get('CROPLENS_DATA_ROOT', 'data')
+
+def has_model_files(folder):
+    return bool(glob.glob(os.path.join(folder, "eval_model_*_Sheet1.csv")))
+
+def folder_fingerprint(folder):
+    # Changes whenever a model file is added, removed or rewritten
+    digest = hashlib.sha1()
+    for model_num, file in sorted(list_model_files(folder)):
+        stat = os.stat(file)
+        digest.update(f'{model_num}:{os.path.basename(file)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()
+
+def _dataset_size(df):
+    return int(df.memory_usage(deep=True).sum())
+
+class DatasetManager:
+    def __init__(self, loader, budget=None, root=DATA_ROOT, cache_dir=CACHE_DIR):
+        self.loader = loader
+        self.root = root
+        self.cache_dir = cache_dir
+        # Loaded datasets are charged to the budget shared with the prefetcher
+        self.budget = budget if budget is not None else MemoryBudget()
+        self._datasets = {}
+        self._lock = threading.Lock()
+        self._evict_callbacks = []
+
+    def on_evict(self, callback):
+        # callback(dataset_key) runs when a dataset leaves memory, so dependent
+        # caches (prefetched filter states) can be released with it
+        self._evict_callbacks.append(callback)
+
+    def list_campaigns(self):
+        # The root itself is a campaign when it holds model files directly,
+        # alongside every sub-folder that does
+        campaigns = {}
+        if has_model_files(self.root):
+            campaigns[os.path.basename(os.path.normpath(self.root))] = self.root
+        for entry in sorted(os.scandir(self.root), key=lambda e: e.name) if os.path.isdir(self.root) else []:
+            if entry.is_dir() and has_model_files(entry.path):
+                campaigns[entry.name] = entry.path
+        return campaigns
+
+    def get(self, campaign, folder):
+        # Returns (df, model_nums, dataset_key); dataset_key changes with the files on disk
+        fingerprint = folder_fingerprint(folder)
+        dataset_key = (campaign, fingerprint, self.loader.__name__)
+        with self._lock:
+            dataset = self._datasets.get(dataset_key)
+        if dataset is not None:
+            self.budget.touch(('dataset', dataset_key))
+            df, model_nums = dataset
+            return df, model_nums, dataset_key
+
+        df, model_nums = self._load(campaign, folder, fingerprint)
+        if df is None:
+            return None, [], dataset_key
+
+        with self._lock:
+            stale = [key for key in self._datasets if key[0] == campaign and key != dataset_key]
+            for key in stale:
+                del self._datasets[key]
+            self._datasets[dataset_key] = (df, model_nums)
+        for key in stale:
+            self.budget.release(('dataset', key))
+            self._notify_evicted(key)
+        self.budget.charge(('dataset', dataset_key), _dataset_size(df), self._evict)
+        return df, model_nums, dataset_key
+
+    def _evict(self, budget_key):
+        dataset_key = budget_key[1]
+        with self._lock:
+            removed = self._datasets.pop(dataset_key, None) is not None
+        if removed:
+            self._notify_evicted(dataset_key)
+
+    def _notify_evicted(self, dataset_key):
+        for callback in self._evict_callbacks:
+            callback(dataset_key)
+
+    def _cache_path(self, campaign, fingerprint):
+        prefix = hashlib.sha1(f'{self.loader.__name__}:{os.path.abspath(self.root)}:{campaign}'.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, 'datasets', f'{prefix}-{fingerprint}.pkl')
+
+    def _load(self, campaign, folder, fingerprint):
+        # Parsed datasets are pickled next to the aggregate cache, so a campaign
+        # evicted from memory comes back without re-reading and merging its CSVs
+        cache_path = self._cache_path(campaign, fingerprint)
+        if os.path.exists(cache_path):
+            return pd.read_pickle(cache_path)
+        df, model_nums = self.loader(folder)
+        if df is None:
+            return None, []
+        prefix = os.path.basename(cache_path).split('-')[0]
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        for old_path in glob.glob(os.path.join(os.path.dirname(cache_path), f'{prefix}-*.pkl')):
+            if old_path != cache_path:
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+        tmp_path = f'{cache_path}.{os.getpid()}-{threading.get_ident()}.tmp'
+        pd.to_pickle((df, model_nums), tmp_path)
+        os.replace(tmp_path, cache_path)
+        return df, model_nums
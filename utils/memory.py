@@ -0,0 +1,61 @@
+import os
+import threading
+from collections import OrderedDict
+
+# One limit for loaded datasets and everything cached from them
+CACHE_MB = int(os.environ.get('CROPLENS_CACHE_MB', '1024'))
+
+class MemoryBudget:
+    # Shared LRU accountant: each cache charges its entries here with an eviction
+    # callback, and entries are evicted past the limit. An entry derived from
+    # another one (a prefetched state from its dataset) names it as parent.
+    # Derived entries are always evicted first, least recently used first, so
+    # prefetching for one campaign never pushes another campaign's dataset out;
+    # datasets are only evicted, by LRU, to make room for another dataset.
+    # Using a child keeps its parent recent too.
+    def __init__(self, max_bytes=CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes
+
+    def charge(self, key, size, on_evict, parent=None):
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[0]
+            if parent in self._entries:
+                self._entries.move_to_end(parent)
+            self._entries[key] = (size, on_evict, parent)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                # A new child that does not fit is dropped itself once older children are gone
+                old_key = next((k for k, entry in self._entries.items() if entry[2] is not None), None)
+                if old_key is None:
+                    old_key = next((k for k in self._entries if k != key), None)
+                if old_key is None:
+                    break
+                old_size, callback, _ = self._entries.pop(old_key)
+                self._total_bytes -= old_size
+                evicted.append((old_key, callback))
+        # Callbacks run outside the lock, since they may release further entries
+        for old_key, callback in evicted:
+            callback(old_key)
+
+    def touch(self, key):
+        with self._lock:
+            if key in self._entries:
+                parent = self._entries[key][2]
+                if parent in self._entries:
+                    self._entries.move_to_end(parent)
+                self._entries.move_to_end(key)
+
+    def release(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[0]
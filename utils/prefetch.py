@@ -0,0 +1,148 @@
+import os
+import threading
+import itertools
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from utils.utils import apply_filters, calculate_model_metrics, calculate_model_metrics_long, is_long_format
+from utils.memory import MemoryBudget
+
+# Set CROPLENS_PREFETCH=0 to turn speculative prefetching off on busy servers
+PREFETCH_ENABLED = os.environ.get('CROPLENS_PREFETCH', '1') != '0'
+PREFETCH_WORKERS = int(os.environ.get('CROPLENS_PREFETCH_WORKERS', '2'))
+
+def neighbor_selections(selection, options):
+    # Every selection reachable by changing exactly one select box
+    neighbors = []
+    for i, values in enumerate(options):
+        for value in values:
+            if value != selection[i]:
+                neighbors.append(selection[:i] + (value,) + selection[i + 1:])
+    return neighbors
+
+def compute_filter_state(df, model_nums, selection):
+    filtered_df = apply_filters(df, selection)
+    if is_long_format(filtered_df):
+        model_metrics = calculate_model_metrics_long(filtered_df, model_nums)
+    else:
+        model_metrics = calculate_model_metrics(filtered_df, model_nums)
+    return filtered_df, model_metrics
+
+def _frame_size(df):
+    # Categorical columns share their categories with the loaded dataset, so only the codes count
+    size = df.index.memory_usage(deep=True)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            size += df[col].cat.codes.nbytes
+        else:
+            size += df[col].memory_usage(deep=True, index=False)
+    return size
+
+def _state_size(state):
+    filtered_df, model_metrics = state
+    size = _frame_size(filtered_df)
+    for m in model_metrics:
+        size += _frame_size(m['data'])
+    return int(size)
+
+class FilterPrefetcher:
+    def __init__(self, budget=None, max_workers=PREFETCH_WORKERS, enabled=PREFETCH_ENABLED):
+        self.enabled = enabled
+        # Cached states are charged to the budget shared with the dataset manager
+        self.budget = budget if budget is not None else MemoryBudget()
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch') if enabled else None
+        # Per-session bookkeeping, dropped as soon as the session has no work left
+        self._futures = {}
+        self._generations = {}
+        self._next_generation = itertools.count(1)
+        # One token per live dataset; jobs holding an older token were invalidated
+        self._tokens = {}
+
+    def get(self, key):
+        with self._lock:
+            state = self._cache.get(key)
+        if state is not None:
+            self.budget.touch(('state', key))
+        return state
+
+    def put(self, key, state, token=None):
+        size = _state_size(state)
+        if size > self.budget.max_bytes:
+            return
+        with self._lock:
+            if token is not None and self._tokens.get(key[0]) is not token:
+                return
+            self._cache[key] = state
+        self.budget.charge(('state', key), size, self._evict, parent=('dataset', key[0]))
+        with self._lock:
+            stored = key in self._cache
+        if not stored:
+            # Invalidated while being charged
+            self.budget.release(('state', key))
+
+    def _evict(self, budget_key):
+        with self._lock:
+            self._cache.pop(budget_key[1], None)
+
+    def invalidate(self, dataset_key):
+        # Drop cached states for the dataset and stop any work still queued or running for it
+        with self._lock:
+            self._tokens.pop(dataset_key, None)
+            keys = [key for key in self._cache if key[0] == dataset_key]
+            for key in keys:
+                del self._cache[key]
+            queued = [future for futures in self._futures.values() for future, key in futures.items() if key == dataset_key]
+        for key in keys:
+            self.budget.release(('state', key))
+        for future in queued:
+            future.cancel()
+
+    def cancel(self, owner):
+        # Drop queued work for this session; running jobs stop before computing
+        with self._lock:
+            self._generations.pop(owner, None)
+            futures = self._futures.pop(owner, {})
+        for future in futures:
+            future.cancel()
+
+    def schedule(self, owner, dataset_key, df, model_nums, selection, options):
+        self.cancel(owner)
+        if not self.enabled:
+            return
+        generation = next(self._next_generation)
+        with self._lock:
+            self._generations[owner] = generation
+            token = self._tokens.setdefault(dataset_key, object())
+        futures = {}
+        for neighbor in neighbor_selections(selection, options):
+            key = (dataset_key, neighbor)
+            if self.get(key) is not None:
+                continue
+            future = self._executor.submit(self._prefetch, owner, generation, token, key, df, model_nums, neighbor)
+            futures[future] = dataset_key
+        with self._lock:
+            if self._generations.get(owner) != generation:
+                return
+            if not futures:
+                del self._generations[owner]
+                return
+            self._futures[owner] = futures
+        for future in list(futures):
+            future.add_done_callback(lambda future: self._job_done(owner, future))
+
+    def _job_done(self, owner, future):
+        with self._lock:
+            futures = self._futures.get(owner)
+            if futures is None or future not in futures:
+                return
+            del futures[future]
+            if not futures:
+                del self._futures[owner]
+                del self._generations[owner]
+
+    def _prefetch(self, owner, generation, token, key, df, model_nums, selection):
+        with self._lock:
+            if self._generations.get(owner) != generation or self._tokens.get(key[0]) is not token or key in self._cache:
+                return
+        self.put(key, compute_filter_state(df, model_nums, selection), token)
@@ -7,11 +7,40 @@ import numpy as np
 from io import BytesIO
 import base64
 
-@st.cache_data
+# On-disk cache for parsed datasets and per-file aggregates
+CACHE_DIR = os.environ.get('CROPLENS_CACHE_DIR', '.cache')
+
+def list_model_files(data_folder):
+    model_files = []
+    for file in glob.glob(os.path.join(data_folder, "eval_model_*_Sheet1.csv")):
+        match = re.search(r'eval_model_(\d+)_Sheet1\.csv', os.path.basename(file))
+        if not match:
+            st.warning(f"Skipping file with invalid name format: {file}")
+            continue
+        model_num = int(match.group(1))
+        if model_num == 18:
+            continue
+        model_files.append((model_num, file))
+    return model_files
+
+def read_model_file(file):
+    df = pd.read_csv(file)
+    df.columns = df.columns.str.strip().str.lower().str.replace('"', '').str.replace('porte-greffe', 'porte_greffe')
+
+    for col in ['true_count', 'detect_count', 'tp', 'fp', 'fn']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    for col in ['precision', 'recall']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    if 'compagnie' in df.columns:
+        df = df.rename(columns={'compagnie': 'year'})
+    return df
+
 def load_data(data_folder):
     try:
-        csv_files = glob.glob(os.path.join(data_folder, "eval_model_*_Sheet1.csv"))
-        if not csv_files:
+        if not glob.glob(os.path.join(data_folder, "eval_model_*_Sheet1.csv")):
             st.error(f"No CSV files found in {data_folder}")
             return None, []
 
@@ -19,26 +48,10 @@ def load_data(data_folder):
         model_nums = []
         common_cols = ['filename', 'year', 'domaine', 'porte_greffe', 'parcelle']
 
-        for file in csv_files:
-            match = re.search(r'eval_model_(\d+)_Sheet1\.csv', os.path.basename(file))
-            if not match:
-                st.warning(f"Skipping file with invalid name format: {file}")
-                continue
-            model_num = int(match.group(1))
-            if model_num == 18:
-                continue
+        for model_num, file in list_model_files(data_folder):
             model_nums.append(model_num)
-            
-            df = pd.read_csv(file)
-            df.columns = df.columns.str.strip().str.lower().str.replace('"', '').str.replace('porte-greffe', 'porte_greffe')
-            
-            for col in ['true_count', 'detect_count', 'tp', 'fp', 'fn']:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-            for col in ['precision', 'recall']:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-            
+
+            df = read_model_file(file)
             df = df.rename(columns={
                 'precision': f'precision_{model_num}',
                 'recall': f'recall_{model_num}',
@@ -49,9 +62,6 @@ def load_data(data_folder):
                 'detect_count': f'detect_count_{model_num}'
             })
             
-            if 'compagnie' in df.columns:
-                df = df.rename(columns={'compagnie': 'year'})
-            
             if merged_df is None:
                 merged_df = df
             else:
@@ -79,6 +89,38 @@ def load_data(data_folder):
         st.error(f"Error loading data: {str(e)}")
         return None, []
 
+KEY_COLUMNS = ['filename', 'year', 'domaine', 'porte_greffe', 'parcelle']
+METRIC_COLUMNS = ['precision', 'recall', 'tp', 'fp', 'fn', 'true_count', 'detect_count']
+
+def load_long_data(data_folder):
+    # One row per evaluated (image, model) pair instead of an outer-merged wide frame
+    try:
+        model_files = list_model_files(data_folder)
+        if not model_files:
+            st.error(f"No CSV files found in {data_folder}")
+            return None, []
+
+        frames = []
+        for model_num, file in model_files:
+            df = read_model_file(file)
+            missing_keys = [col for col in KEY_COLUMNS if col not in df.columns]
+            if missing_keys:
+                st.error(f"Missing key columns in {file}: {', '.join(missing_keys)}")
+                return None, []
+            df = df[KEY_COLUMNS + [col for col in METRIC_COLUMNS if col in df.columns]]
+            frames.append(df.assign(model=model_num))
+
+        long_df = pd.concat(frames, ignore_index=True)
+        for col in ['filename', 'domaine', 'porte_greffe']:
+            long_df[col] = long_df[col].astype('category')
+        for col in ['year', 'parcelle', 'model', 'tp', 'fp', 'fn', 'true_count', 'detect_count']:
+            if col in long_df.columns and pd.api.types.is_integer_dtype(long_df[col]):
+                long_df[col] = pd.to_numeric(long_df[col], downcast='integer')
+        return long_df, sorted(num for num, _ in model_files)
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+        return None, []
+
 def calculate_model_metrics(df, model_nums):
     model_metrics = []
     for mn in model_nums:
@@ -104,7 +146,118 @@ def calculate_model_metrics(df, model_nums):
             'total_tp': total_tp,
             'total_fp': total_fp,
             'total_fn': total_fn,
+            # Images the model was evaluated on; the outer merge leaves the others empty
+            'images_evaluated': int(df[prec_col].notna().sum()),
             'data': df[['filename', 'year', 'domaine', 'porte_greffe', 'parcelle', prec_col, rec_col, tp_col, fp_col, fn_col]].copy()
         })
     return model_metrics
 
+
+def is_long_format(df):
+    return 'model' in df.columns
+
+def to_wide(long_df, model_nums, metrics=None):
+    # Wide view with the precision_<n>, recall_<n>, ... layout produced by load_data
+    if metrics is None:
+        metrics = [col for col in METRIC_COLUMNS if col in long_df.columns]
+    wide = long_df.groupby(KEY_COLUMNS + ['model'], observed=True, dropna=False, sort=False)[metrics].first().unstack('model')
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([metrics, model_nums]))
+    wide.columns = [f'{metric}_{mn}' for metric, mn in wide.columns]
+    wide = wide.reset_index()
+    for col in KEY_COLUMNS:
+        if isinstance(wide[col].dtype, pd.CategoricalDtype):
+            wide[col] = wide[col].astype(object)
+    return wide
+
+def count_images(df):
+    if is_long_format(df):
+        return len(df[KEY_COLUMNS].drop_duplicates())
+    return len(df)
+
+def model_frame(df, mn, metrics):
+    # One model's rows, with metric columns named as in the wide layout
+    columns = {metric: f'{metric}_{mn}' for metric in metrics}
+    if is_long_format(df):
+        return df.loc[df['model'] == mn, KEY_COLUMNS + metrics].rename(columns=columns)
+    return df[KEY_COLUMNS + list(columns.values())]
+
+def context_means(df, model_nums, context, metric):
+    # Mean across models of each model's per-context mean, indexed by context
+    if is_long_format(df):
+        per_model = df.groupby([context, 'model'], observed=True)[metric].mean()
+        return per_model.groupby(level=0, observed=True).mean()
+    per_model = df.groupby(context).agg({f'{metric}_{mn}': 'mean' for mn in model_nums})
+    return per_model.mean(axis=1)
+
+def melt_metric(df, model_nums, metric):
+    # filename, model ('Model <n>') and metric columns, one row per image and model
+    if is_long_format(df):
+        melted = df[['filename', 'model', metric]].copy()
+        melted['filename'] = melted['filename'].astype(object)
+        melted['model'] = 'Model ' + melted['model'].astype(str)
+        return melted
+    melted = df.melt(id_vars=['filename'], value_vars=[f'{metric}_{mn}' for mn in model_nums], var_name='model', value_name=metric)
+    melted['model'] = melted['model'].str.replace(f'{metric}_', 'Model ')
+    return melted
+
+def image_metric_means(df, model_nums, metric):
+    # Per-image mean of a metric over the models actually evaluated on that image
+    if is_long_format(df):
+        means = df.groupby(KEY_COLUMNS, observed=True, dropna=False, sort=False)[metric].mean().reset_index()
+        for col in KEY_COLUMNS:
+            if isinstance(means[col].dtype, pd.CategoricalDtype):
+                means[col] = means[col].astype(object)
+        return means
+    means = df[KEY_COLUMNS].copy()
+    means[metric] = df[[f'{metric}_{mn}' for mn in model_nums]].mean(axis=1)
+    return means
+
+def calculate_model_metrics_long(long_df, model_nums):
+    # Same output as calculate_model_metrics, reading only evaluated pairs
+    model_metrics = []
+    by_model = dict(tuple(long_df.groupby('model', sort=False)))
+    for mn in model_nums:
+        data = by_model.get(mn, long_df.iloc[0:0])
+        valid_data = data[data['precision'] > 0]
+        avg_precision = valid_data['precision'].mean() if not valid_data.empty else 0
+        avg_recall = valid_data['recall'].mean() if not valid_data.empty else 0
+        f1 = (2 * avg_precision * avg_recall) / (avg_precision + avg_recall) if (avg_precision + avg_recall) > 0 else 0
+        renamed = data[KEY_COLUMNS + ['precision', 'recall', 'tp', 'fp', 'fn']].rename(columns={
+            'precision': f'precision_{mn}',
+            'recall': f'recall_{mn}',
+            'tp': f'tp_{mn}',
+            'fp': f'fp_{mn}',
+            'fn': f'fn_{mn}'
+        })
+        model_metrics.append({
+            'model': f'Model {mn}',
+            'avg_precision': avg_precision,
+            'avg_recall': avg_recall,
+            'f1': f1,
+            'total_tp': data['tp'].sum(),
+            'total_fp': data['fp'].sum(),
+            'total_fn': data['fn'].sum(),
+            'images_evaluated': len(data),
+            'data': renamed.reset_index(drop=True)
+        })
+    return model_metrics
+
+FILTER_COLUMNS = ['year', 'domaine', 'porte_greffe', 'parcelle']
+ALL_LABELS = {
+    'year': 'All Years',
+    'domaine': 'All Domaines',
+    'porte_greffe': 'All Porte Greffes',
+    'parcelle': 'All Parcelles'
+}
+
+def apply_filters(df, selection):
+    # selection is a (year, domaine, porte_greffe, parcelle) tuple of select box values
+    filtered_df = df
+    for col, value in zip(FILTER_COLUMNS, selection):
+        if value == ALL_LABELS[col]:
+            continue
+        if col in ('year', 'parcelle'):
+            filtered_df = filtered_df[filtered_df[col].astype(str) == value]
+        else:
+            filtered_df = filtered_df[filtered_df[col] == value]
+    return filtered_df.copy()